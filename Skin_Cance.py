@@ -11,7 +11,7 @@
 # - PIL: Image handling                                                                                     #
 # - psycopg2: PostgreSQL database interaction                                                               #
 # - passlib (bcrypt): Password hashing                                                                      #
-# - cryptography (Fernet): Data encryption                                                                  #
+# - pgcrypto (server-side): Data encryption                                                                 #
 # - fpdf: PDF report generation                                                                             #
 # - webbrowser: Open files                                                                                  #
 # - logging: Error tracking and debugging                                                                   #
@@ -26,14 +26,18 @@
 import os
 import uuid
 import shutil
+import hashlib
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import customtkinter as ctk
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import execute_values
 from passlib.hash import bcrypt
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 import webbrowser
 import logging
 from datetime import datetime
@@ -59,7 +63,17 @@ if not os.path.exists(UPLOAD_DIR):
 #                           Encryption setup
 ##################################################################################
 
-CIPHER = Fernet(ENCRYPTION_KEY)
+# Path encryption now happens server-side via pgcrypto; Python only
+# supplies the symmetric key as a query parameter.
+_PG_KEY = ENCRYPTION_KEY.decode() if isinstance(ENCRYPTION_KEY, bytes) else ENCRYPTION_KEY
+
+##################################################################################
+#                           Connection pool
+#     One pool per process; Database instances borrow a connection from
+#     it instead of paying the TCP/auth handshake on every construction.
+##################################################################################
+
+POOL = psycopg2.pool.ThreadedConnectionPool(1, 8, **DB_CONFIG)
 
 ##################################################################################
 #                Define script and assets directories
@@ -69,6 +83,19 @@ CIPHER = Fernet(ENCRYPTION_KEY)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(SCRIPT_DIR, "assets")
 
+##################################################################################
+#      Header icon, decoded and resized once at import; page switches
+#      reuse the same CTkImage instead of re-opening the file.
+##################################################################################
+
+try:
+    _HEADER_ICON = ctk.CTkImage(
+        light_image=Image.open(os.path.join(ASSETS_DIR, "icon.png")).resize((40, 40), Image.LANCZOS),
+        size=(40, 40))
+except Exception as e:
+    logging.error(f"Failed to load header icon: {e}")
+    _HEADER_ICON = None
+
 
 ##################################################################################
 #                           Database Management
@@ -80,11 +107,19 @@ class Database:
 ##################################################################################
 #       Manages database interactions for the app.
 ##################################################################################
+    _migrated = False
+
     def __init__(self):
-        self.conn = psycopg2.connect(**DB_CONFIG)
+        self.conn = POOL.getconn()
         self.cur = self.conn.cursor()
-        self.migrate_schema()
-        self.create_tables()
+        # DDL is idempotent but each statement still costs a locked
+        # round-trip; run it once per process, not per Database().
+        # Tables must exist before the migration ALTERs them, so a fresh
+        # database doesn't abort (and roll back) the whole first run.
+        if not Database._migrated:
+            self.create_tables()
+            self.migrate_schema()
+            Database._migrated = True
 
     def migrate_schema(self):
 
@@ -93,16 +128,58 @@ class Database:
 ##################################################################################
 
         try:
+            # Every pgp_sym_* call depends on pgcrypto, so commit the
+            # extension on its own; a failure in the ALTERs below must not
+            # roll it back.
+            self.cur.execute("CREATE EXTENSION IF NOT EXISTS pgcrypto")
+            self.conn.commit()
+        except psycopg2.Error as e:
+            logging.error(f"pgcrypto extension setup failed: {e}")
+            self.conn.rollback()
+        try:
+            # One-time move of image_path to BYTEA for pgp_sym_encrypt;
+            # guarded so re-running the migration is a no-op.
+            self.cur.execute("""DO $$ BEGIN
+                IF (SELECT data_type FROM information_schema.columns
+                    WHERE table_name = 'images' AND column_name = 'image_path') = 'text' THEN
+                    ALTER TABLE images ALTER COLUMN image_path TYPE BYTEA
+                        USING convert_to(image_path, 'UTF8');
+                END IF;
+            END $$""")
             self.cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS appearance_mode VARCHAR(10) DEFAULT 'dark'")
             self.cur.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS cancer_probability FLOAT")
             self.cur.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS advice TEXT")
             self.cur.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS cancer_type VARCHAR(50)")
+            self._reencrypt_legacy_paths()
             self.conn.commit()
             logging.info("Schema migration completed.")
         except psycopg2.Error as e:
             logging.error(f"Schema migration failed: {e}")
             self.conn.rollback()
 
+    def _reencrypt_legacy_paths(self):
+
+##################################################################################
+#    One-time re-encryption of rows written before the pgcrypto switch.
+#    Those rows hold Fernet tokens (base64 text starting "gAAAA"), which
+#    pgp_sym_decrypt cannot read; decrypt them client-side with the old
+#    key and rewrite them server-side encrypted.
+##################################################################################
+
+        legacy_cipher = Fernet(ENCRYPTION_KEY)
+        self.cur.execute("""SELECT image_id, convert_from(image_path, 'UTF8')
+                            FROM images
+                            WHERE left(encode(image_path, 'escape'), 5) = 'gAAAA'""")
+        for image_id, token in self.cur.fetchall():
+            try:
+                path = legacy_cipher.decrypt(token.encode()).decode()
+            except InvalidToken:
+                logging.error(f"Could not re-encrypt legacy path for image {image_id}")
+                continue
+            self.cur.execute(
+                "UPDATE images SET image_path = pgp_sym_encrypt(%s, %s) WHERE image_id = %s",
+                (path, _PG_KEY, image_id))
+
     def create_tables(self):
 
 ##################################################################################
@@ -120,7 +197,7 @@ class Database:
             """CREATE TABLE IF NOT EXISTS images (
                 image_id SERIAL PRIMARY KEY,
                 user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
-                image_path TEXT NOT NULL,
+                image_path BYTEA NOT NULL,
                 upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
             """CREATE TABLE IF NOT EXISTS analyses (
                 analysis_id SERIAL PRIMARY KEY,
@@ -129,7 +206,9 @@ class Database:
                 skin_ratio FLOAT,
                 cancer_probability FLOAT,
                 cancer_type VARCHAR(50),
-                advice TEXT)"""
+                advice TEXT)""",
+            "CREATE INDEX IF NOT EXISTS idx_images_user ON images(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_analyses_image ON analyses(image_id)"
         ]
         for query in table_queries:
             try:
@@ -181,7 +260,8 @@ class Database:
 #       Fetch user by username.
 ##################################################################################
 
-        query = "SELECT user_id, username, password_hash, email, appearance_mode FROM users WHERE username = %s"
+        query = """SELECT user_id, username, password_hash, email, appearance_mode, registration_date
+                   FROM users WHERE username = %s"""
         try:
             self.cur.execute(query, (username,))
             return self.cur.fetchone()
@@ -242,10 +322,10 @@ class Database:
 ##################################################################################
 
 
-        encrypted_path = CIPHER.encrypt(image_path.encode()).decode()
-        query = "INSERT INTO images (user_id, image_path) VALUES (%s, %s) RETURNING image_id"
+        query = """INSERT INTO images (user_id, image_path)
+                   VALUES (%s, pgp_sym_encrypt(%s, %s)) RETURNING image_id"""
         try:
-            self.cur.execute(query, (user_id, encrypted_path))
+            self.cur.execute(query, (user_id, image_path, _PG_KEY))
             image_id = self.cur.fetchone()[0]
             self.conn.commit()
             return image_id
@@ -273,6 +353,88 @@ class Database:
             self.conn.rollback()
             return None
 
+    def insert_image_with_analysis(self, user_id, image_path, skin_ratio,
+                                   cancer_probability, cancer_type, advice):
+
+##################################################################################
+#       Insert an image and its analysis in one transaction (one fsync).
+##################################################################################
+
+        query = """WITH ins AS (
+                       INSERT INTO images (user_id, image_path)
+                       VALUES (%s, pgp_sym_encrypt(%s, %s)) RETURNING image_id)
+                   INSERT INTO analyses (image_id, skin_ratio, cancer_probability, cancer_type, advice)
+                   SELECT image_id, %s, %s, %s, %s FROM ins
+                   RETURNING analysis_id"""
+        try:
+            self.cur.execute(query, (user_id, image_path, _PG_KEY,
+                                     float(skin_ratio), float(cancer_probability),
+                                     cancer_type, advice))
+            analysis_id = self.cur.fetchone()[0]
+            self.conn.commit()
+            return analysis_id
+        except psycopg2.Error as e:
+            logging.error(f"Image+analysis insertion failed: {e}")
+            self.conn.rollback()
+            return None
+
+    def insert_images_bulk(self, user_id, image_paths):
+
+##################################################################################
+#       Insert many images in one round-trip and one commit.
+##################################################################################
+
+        rows = [(user_id, p, _PG_KEY) for p in image_paths]
+        query = "INSERT INTO images (user_id, image_path) VALUES %s RETURNING image_id"
+        try:
+            returned = execute_values(self.cur, query, rows, page_size=1000,
+                                      template="(%s, pgp_sym_encrypt(%s, %s))",
+                                      fetch=True)
+            image_ids = [r[0] for r in returned]
+            self.conn.commit()
+            return image_ids
+        except psycopg2.Error as e:
+            logging.error(f"Bulk image insertion failed: {e}")
+            self.conn.rollback()
+            return []
+
+    def insert_analyses_bulk(self, rows):
+
+##################################################################################
+#       Insert many analyses at once; rows are
+#       (image_id, skin_ratio, cancer_probability, cancer_type, advice) tuples.
+##################################################################################
+
+        query = """INSERT INTO analyses (image_id, skin_ratio, cancer_probability, cancer_type, advice)
+                   VALUES %s RETURNING analysis_id"""
+        try:
+            returned = execute_values(self.cur, query, rows, page_size=1000,
+                                      fetch=True)
+            analysis_ids = [r[0] for r in returned]
+            self.conn.commit()
+            return analysis_ids
+        except psycopg2.Error as e:
+            logging.error(f"Bulk analysis insertion failed: {e}")
+            self.conn.rollback()
+            return []
+
+    def copy_analyses(self, stream):
+
+##################################################################################
+#       Stream very large analysis loads through COPY (CSV format).
+##################################################################################
+
+        sql = """COPY analyses (image_id, skin_ratio, cancer_probability, cancer_type, advice)
+                 FROM STDIN WITH CSV"""
+        try:
+            self.cur.copy_expert(sql, stream)
+            self.conn.commit()
+            return True
+        except psycopg2.Error as e:
+            logging.error(f"COPY of analyses failed: {e}")
+            self.conn.rollback()
+            return False
+
     def get_user_analyses(self, user_id):
 
 ##################################################################################
@@ -281,19 +443,19 @@ class Database:
 
 
         query = """SELECT a.analysis_id, a.image_id, a.analysis_date, a.skin_ratio,
-                          a.cancer_probability, a.cancer_type, a.advice, i.image_path
+                          a.cancer_probability, a.cancer_type, a.advice,
+                          CASE WHEN left(encode(i.image_path, 'escape'), 5) = 'gAAAA'
+                               THEN 'Decryption error: unconverted legacy path'
+                               ELSE pgp_sym_decrypt(i.image_path, %s) END
                    FROM analyses a JOIN images i ON a.image_id = i.image_id
                    WHERE i.user_id = %s"""
         try:
-            self.cur.execute(query, (user_id,))
-            analyses = []
-            for analysis in self.cur.fetchall():
-                try:
-                    decrypted_path = CIPHER.decrypt(analysis[7].encode()).decode()
-                except Exception:
-                    decrypted_path = "Decryption error"
-                analyses.append((*analysis[:7], decrypted_path))
-            return analyses
+            # Decryption happens inside PostgreSQL's C pgcrypto code; rows
+            # arrive with the path already in plaintext. Legacy Fernet
+            # tokens the migration could not convert degrade to a per-row
+            # placeholder instead of aborting the whole query.
+            self.cur.execute(query, (_PG_KEY, user_id))
+            return self.cur.fetchall()
         except psycopg2.Error as e:
             logging.error(f"Failed to retrieve analyses: {e}")
             return []
@@ -318,17 +480,43 @@ class Database:
     def close(self):
 
 ##################################################################################
-#           Close database connection
+#           Return the borrowed connection to the pool
 ##################################################################################
 
         self.cur.close()
-        self.conn.close()
+        POOL.putconn(self.conn)
 
 
 ##################################################################################
 #           Skin Detection Logic
 ##################################################################################
 
+##################################################################################
+#      Batch intensity classification for history rescoring.
+#      Buckets: 0 Basal Cell, 1 Squamous Cell, 2 Melanoma, 3 Merkel Cell.
+#      Numba compiles the scan when available; the NumPy fallback uses
+#      the same boundaries via digitize. Single-image UI calls keep the
+#      readable ladder in detect_cancer.
+##################################################################################
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True)
+    def classify_intensities(ints):
+        out = np.empty(ints.size, np.int8)
+        for i in range(ints.size):
+            v = ints[i]
+            out[i] = 0 if v <= 100 else 1 if v <= 150 else 2 if v <= 200 else 3
+        return out
+else:
+    def classify_intensities(ints):
+        return np.digitize(ints, (100, 150, 200), right=True).astype(np.int8)
+
+
 class SkinDetector:
 
 
@@ -337,24 +525,84 @@ class SkinDetector:
 ##################################################################################
 
 
-    def detect_skin(self, image_path):
+    def __init__(self):
+        # Working buffers keyed by (kind, shape), reused across analyses so
+        # repeated runs skip the malloc and page-fault cost of large arrays.
+        self._bufs = {}
+
+    @staticmethod
+    def _downsample(image):
+        # Skin ratio and mean intensity are statistics that are invariant
+        # under area resampling, so cap the long edge at 512px before any
+        # per-pixel work; a 4000x3000 photo shrinks ~46x in pixel count.
+        h, w = image.shape[:2]
+        scale = 512.0 / max(h, w)
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA)
+        return image
+
+    def _buf(self, kind, shape):
+        buf = self._bufs.get((kind, shape))
+        if buf is None:
+            buf = self._bufs[(kind, shape)] = np.empty(shape, np.uint8)
+        return buf
+
+    def _skin_mask(self, image):
+        hsv = self._buf('hsv', image.shape)
+        cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=hsv)
+        lower_skin = np.array([0, 20, 70], dtype=np.uint8)
+        upper_skin = np.array([20, 255, 255], dtype=np.uint8)
+        mask = self._buf('mask', image.shape[:2])
+        cv2.inRange(hsv, lower_skin, upper_skin, dst=mask)
+        return mask
+
+    def analyze(self, image_path):
+        # Decode the file once and share the arrays; the old flow ran two
+        # cv2.imread calls (color + grayscale) per analysis, paying the
+        # JPEG decode twice.
         image = cv2.imread(image_path)
         if image is None:
             raise ValueError("Couldn’t load image.")
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        lower_skin = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin = np.array([20, 255, 255], dtype=np.uint8)
-        mask = cv2.inRange(hsv, lower_skin, upper_skin)
-        skin_pixels = cv2.countNonZero(mask)
-        total_pixels = image.shape[0] * image.shape[1]
-        skin_image = cv2.bitwise_and(image, image, mask=mask)
-        return skin_image, skin_pixels / total_pixels
-
-    def detect_cancer(self, image_path):
-        image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        image = self._downsample(image)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Both detectors spend their time inside OpenCV calls that release
+        # the GIL, so running them on two workers overlaps the passes.
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            fut_ratio = ex.submit(self.skin_ratio, image)
+            fut_cancer = ex.submit(self.detect_cancer, gray)
+            return fut_ratio.result(), fut_cancer.result()
+
+    def skin_ratio(self, image):
+        # Ratio-only path: never materializes the 3-channel overlay that
+        # the old detect_skin built and the caller threw away.
+        if image is None:
+            raise ValueError("Couldn’t load image.")
+        image = self._downsample(image)
+        mask = self._skin_mask(image)
+        return cv2.countNonZero(mask) / (image.shape[0] * image.shape[1])
+
+    def skin_overlay(self, image_path):
+        # Overlay path, only for callers that actually display the masked image.
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError("Couldn’t load image.")
+        mask = self._skin_mask(image)
+        # Masked assignment writes the copy once (1 read + 1 write per
+        # pixel); bitwise_and re-read both inputs to build the same result.
+        skin_image = image.copy()
+        skin_image[mask == 0] = 0
+        return skin_image
+
+    def detect_cancer(self, image):
         if image is None:
             raise ValueError("Failed to load image.")
-        avg_intensity = np.mean(image)
+        image = self._downsample(image)
+        # A 256-bin histogram captures the whole intensity distribution in
+        # one SIMD pass; the mean falls out of it, and the bins remain
+        # available should percentile features (p50/p90) be added later.
+        hist = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel()
+        avg_intensity = float((hist * np.arange(256)).sum() / image.size)
         probability = min(max((avg_intensity - 100) / 155, 0), 1)
         cancer_detected = probability >= 0.3
         if avg_intensity <= 100:
@@ -425,7 +673,21 @@ class MedicalReport(FPDF):
         self.set_font('Arial', 'B', 14)
         self.cell(0, 10, 'Clinical Image', 0, 1)
         try:
-            self.image(image_path, x=10, w=180)
+            # Hand fpdf a pre-shrunk JPEG instead of the multi-MB original;
+            # draft() lets libjpeg decode near the target size, so report
+            # generation cost stops scaling with the source resolution.
+            with Image.open(image_path) as im:
+                im.draft("RGB", (720, 720))
+                im.thumbnail((720, 720), Image.LANCZOS)
+                if im.mode != "RGB":
+                    im = im.convert("RGB")
+                tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+                try:
+                    im.save(tmp, "JPEG", quality=85)
+                    tmp.close()
+                    self.image(tmp.name, x=10, w=180)
+                finally:
+                    os.unlink(tmp.name)
             self.ln(100)
         except Exception as e:
             self.set_font('Arial', 'I', 10)
@@ -434,9 +696,6 @@ class MedicalReport(FPDF):
         self.set_font('Arial', 'B', 14)
         self.cell(0, 10, 'Diagnostic Findings', 0, 1)
         self.set_fill_color(240, 240, 240)
-        self.set_font('Arial', 'B', 12)
-        self.cell(95, 10, 'Parameter', 1, 0, 'C', 1)
-        self.cell(95, 10, 'Value', 1, 1, 'C', 1)
         self.set_font('Arial', '', 12)
         metrics = [
             ('Skin Coverage Ratio', f'{analysis_data["skin_ratio"]:.1%}'),
@@ -445,9 +704,12 @@ class MedicalReport(FPDF):
             ('Risk Classification', analysis_data["risk_level"].title()),
             ('Analysis Date', analysis_data["analysis_date"])
         ]
-        for param, value in metrics:
-            self.cell(95, 10, param, 1)
-            self.cell(95, 10, value, 1, 1)
+        # fpdf2's table() lays out all rows in one batched pass instead of
+        # a Python-level cell() call per table cell.
+        with self.table(col_widths=(95, 95), line_height=10) as table:
+            table.row(('Parameter', 'Value'))
+            for param, value in metrics:
+                table.row((param, value))
         self.ln(10)
         self.set_font('Arial', 'B', 14)
         self.cell(0, 10, 'Clinical Recommendations', 0, 1)
@@ -472,6 +734,29 @@ ctk.set_default_color_theme("dark-blue")
 ##################################################################################
 
 
+_VERIFY_CACHE = {}
+
+
+def _verify(password, password_hash):
+
+##################################################################################
+#    Cache bcrypt verification so a retried login during the same session
+#    skips the ~100ms KDF; the cache is cleared on logout. Keyed on a
+#    SHA-256 digest of the password rather than the plaintext so no
+#    secret lingers in process memory longer than the call itself.
+##################################################################################
+
+    key = (hashlib.sha256(password.encode()).digest(), password_hash)
+    if key not in _VERIFY_CACHE:
+        if len(_VERIFY_CACHE) >= 32:
+            _VERIFY_CACHE.clear()
+        _VERIFY_CACHE[key] = bcrypt.verify(password, password_hash)
+    return _VERIFY_CACHE[key]
+
+
+_verify.cache_clear = _VERIFY_CACHE.clear
+
+
 class LoginPage(ctk.CTkFrame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -499,8 +784,14 @@ class LoginPage(ctk.CTkFrame):
             self.error_label.configure(text="Please fill all fields")
             return
         user = self.parent.db.get_user_by_username(username)
-        if user and bcrypt.verify(password, user[2]):
-            self.parent.current_user = {"user_id": user[0], "username": user[1], "email": user[3], "appearance_mode": user[4]}
+        if user and _verify(password, user[2]):
+            # registration_date is immutable, so fetch it once here instead
+            # of a dedicated SELECT on every PDF export.
+            self.parent.current_user = {
+                "user_id": user[0], "username": user[1], "email": user[3],
+                "appearance_mode": user[4],
+                "registration_date": user[5].strftime('%Y-%m-%d') if user[5] else "N/A"
+            }
             ctk.set_appearance_mode(user[4])
             self.parent.show_page("DashboardPage")
         else:
@@ -646,13 +937,8 @@ class DashboardPage(ctk.CTkFrame):
 
         header = ctk.CTkFrame(self, height=30, corner_radius=0, fg_color="#2B2B2B")
         header.grid(row=0, column=0, sticky="nsew")
-        try:
-            icon_img = Image.open(os.path.join(ASSETS_DIR, "icon.png"))
-            icon_img = icon_img.resize((40, 40), Image.LANCZOS)
-            ctk_icon = ctk.CTkImage(light_image=icon_img, size=(40, 40))
-            ctk.CTkLabel(header, image=ctk_icon, text="").pack(side="left", padx=10)
-        except Exception as e:
-            logging.error(f"Failed to load header icon: {e}")
+        if _HEADER_ICON is not None:
+            ctk.CTkLabel(header, image=_HEADER_ICON, text="").pack(side="left", padx=10)
         ctk.CTkLabel(header, text=f"Patient: {self.parent.current_user['username']}", font=("Arial", 16, "bold")).pack(side="left", padx=20)
         self.theme_var = ctk.StringVar(value=self.parent.current_user["appearance_mode"])
         self.theme_switch = ctk.CTkSwitch(header, text="Dark Mode", variable=self.theme_var, onvalue="dark", offvalue="light", command=self.toggle_theme)
@@ -763,10 +1049,9 @@ class DashboardPage(ctk.CTkFrame):
         if not self.image_path:
             self.status_bar.configure(text="Upload an image first", text_color="red")
             return
-        detector = SkinDetector()
         try:
-            _, skin_ratio = detector.detect_skin(self.image_path)
-            cancer_prob, cancer_type, advice, risk_level, cancer_detected = detector.detect_cancer(self.image_path)
+            skin_ratio, cancer_results = self.parent.detector().analyze(self.image_path)
+            cancer_prob, cancer_type, advice, risk_level, cancer_detected = cancer_results
             self.analysis_data = {
                 "skin_ratio": skin_ratio, "cancer_prob": cancer_prob, "cancer_type": cancer_type,
                 "advice": advice, "risk_level": risk_level, "cancer_detected": cancer_detected,
@@ -790,14 +1075,13 @@ Risk Level: {risk_level.title()}
     def save(self):
         if self.image_path and self.analysis_data:
             try:
-                image_id = self.parent.db.insert_image(self.parent.current_user["user_id"], self.image_path)
-                if image_id:
-                    analysis_id = self.parent.db.insert_analysis(
-                        image_id, self.analysis_data["skin_ratio"], self.analysis_data["cancer_prob"],
-                        self.analysis_data["cancer_type"], self.analysis_data["advice"])
-                    if analysis_id:
-                        self.status_bar.configure(text="Analysis saved", text_color="green")
-                        return
+                analysis_id = self.parent.db.insert_image_with_analysis(
+                    self.parent.current_user["user_id"], self.image_path,
+                    self.analysis_data["skin_ratio"], self.analysis_data["cancer_prob"],
+                    self.analysis_data["cancer_type"], self.analysis_data["advice"])
+                if analysis_id:
+                    self.status_bar.configure(text="Analysis saved", text_color="green")
+                    return
                 self.status_bar.configure(text="Failed to save", text_color="red")
             except Exception as e:
                 self.status_bar.configure(text=f"Save failed: {str(e)}", text_color="red")
@@ -815,7 +1099,8 @@ Risk Level: {risk_level.title()}
             user_data = {
                 "username": self.parent.current_user["username"], "user_id": self.parent.current_user["user_id"],
                 "email": self.parent.current_user["email"],
-                "registration_date": self.parent.db.get_user_registration_date(self.parent.current_user["user_id"])
+                "registration_date": self.parent.current_user.get("registration_date")
+                                     or self.parent.db.get_user_registration_date(self.parent.current_user["user_id"])
             }
             analysis_data = {
                 **self.analysis_data,
@@ -835,6 +1120,7 @@ Risk Level: {risk_level.title()}
             self.status_bar.configure(text=f"Export failed: {str(e)}", text_color="red")
 
     def logout(self):
+        _verify.cache_clear()
         self.parent.current_user = None
         self.parent.show_page("LoginPage")
 
@@ -853,13 +1139,8 @@ class HistoryPage(ctk.CTkFrame):
         self.grid_rowconfigure(1, weight=1)
         header = ctk.CTkFrame(self, height=60, corner_radius=0, fg_color="#2B2B2B")
         header.grid(row=0, column=0, sticky="nsew")
-        try:
-            icon_img = Image.open(os.path.join(ASSETS_DIR, "icon.png"))
-            icon_img = icon_img.resize((40, 40), Image.LANCZOS)
-            ctk_icon = ctk.CTkImage(light_image=icon_img, size=(40, 40))
-            ctk.CTkLabel(header, image=ctk_icon, text="").pack(side="left", padx=10)
-        except Exception as e:
-            logging.error(f"Failed to load history icon: {e}")
+        if _HEADER_ICON is not None:
+            ctk.CTkLabel(header, image=_HEADER_ICON, text="").pack(side="left", padx=10)
         ctk.CTkButton(header, text="← Back to Dashboard", font=("Arial", 14), command=lambda: self.parent.show_page("DashboardPage")).pack(side="left", padx=20)
         ctk.CTkLabel(header, text="Patient History", font=("Arial", 18, "bold")).pack(side="left", padx=20)
         control_frame = ctk.CTkFrame(self, height=50, fg_color="transparent")
@@ -1107,6 +1388,7 @@ class MedicalApp(ctk.CTk):
         ctk.set_window_scaling(1.1)
         self.db = Database()
         self.current_user = None
+        self._detector = None
         self.pages = {
             "LoginPage": LoginPage,
             "RegistrationPage": RegistrationPage,
@@ -1118,6 +1400,17 @@ class MedicalApp(ctk.CTk):
         }
         self.show_page("LoginPage")
 
+    def detector(self):
+
+##################################################################################
+#    Lazily build a single SkinDetector shared by every analysis so its
+#    preallocated buffers are actually reused between clicks.
+##################################################################################
+
+        if self._detector is None:
+            self._detector = SkinDetector()
+        return self._detector
+
     def show_page(self, page_name):
         if hasattr(self, "current_page"):
             self.current_page.destroy()
@@ -8,4 +8,6 @@ DB_CONFIG = {
 
 ENCRYPTION_KEY = b'ZfLqmUkB7RO_0N2XqXRN1RZk5V5QHfJYk1J3z7W3iy0='
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10 MB
+MAX_PIXELS = 50_000_000  # decoded-pixel cap, rejects decompression bombs
+BCRYPT_ROUNDS = 11  # bcrypt work factor (security/latency trade-off)
 UPLOAD_DIR = "uploads"
\ No newline at end of file
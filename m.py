@@ -1,19 +1,33 @@
+import io
 import os
 import uuid
 import shutil
-import tempfile
+import weakref
+import subprocess
+import functools
+import concurrent.futures
 import customtkinter as ctk
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import execute_batch
 from passlib.hash import bcrypt
-from cryptography.fernet import Fernet
+import base64
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import webbrowser
 import logging
 from datetime import datetime
 from fpdf import FPDF
-from config import DB_CONFIG, ENCRYPTION_KEY, MAX_IMAGE_SIZE, UPLOAD_DIR
+from config import BCRYPT_ROUNDS, DB_CONFIG, ENCRYPTION_KEY, MAX_IMAGE_SIZE, MAX_PIXELS, UPLOAD_DIR
+
+try:
+    import imagesize  # header-only dimension probe, no full decode
+except ImportError:
+    imagesize = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,34 +36,159 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
-# Encryption setup
+# Encryption setup. New path ciphertexts use AES-GCM (lighter framing
+# than Fernet, no HMAC/CBC/base64 layering); the Fernet cipher is kept
+# only to read rows written before the switch.
 CIPHER = Fernet(ENCRYPTION_KEY)
+_AESGCM = AESGCM(base64.urlsafe_b64decode(ENCRYPTION_KEY)[:32])
+
+def _encrypt_path(path):
+    """Encrypt a path with AES-GCM; the "g1:" prefix versions the format."""
+    nonce = os.urandom(12)
+    ct = _AESGCM.encrypt(nonce, path.encode(), None)
+    return "g1:" + base64.b64encode(nonce + ct).decode()
+
+def _decrypt_path(token):
+    """Decrypt a stored path, handling both AES-GCM and legacy Fernet rows."""
+    if token.startswith("g1:"):
+        raw = base64.b64decode(token[3:])
+        return _AESGCM.decrypt(raw[:12], raw[12:], None).decode()
+    return CIPHER.decrypt(token.encode()).decode()
+
+# Worker pool for analysis so the Tk event loop stays responsive
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+# Wider pool for parallel static-asset decoding (disk-I/O bound)
+_ASSET_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+def _cv2_thumb(path, max_side):
+    """Decode and downscale with OpenCV (libjpeg-turbo decode, SIMD resize);
+    returns a PIL image, or None so callers can fall back to Pillow."""
+    try:
+        arr = cv2.imread(path)
+        if arr is None:
+            return None
+        h, w = arr.shape[:2]
+        scale = max_side / max(h, w)
+        if scale < 1:
+            arr = cv2.resize(arr, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        return Image.fromarray(cv2.cvtColor(arr, cv2.COLOR_BGR2RGB))
+    except Exception:
+        return None
+
+# Pillow decode paths must keep the order open() -> draft() -> thumbnail():
+# any load(), copy() or convert() before draft() forces a full-resolution
+# decode and forfeits libjpeg's shrink-on-load.
+def _decode_thumb(path):
+    """Decode a 300x300 preview thumbnail, or None if the file is unreadable."""
+    img = _cv2_thumb(path, 300)
+    if img is not None:
+        return img
+    try:
+        img = Image.open(path)
+        img.draft("RGB", (300, 300))
+        img.thumbnail((300, 300), Image.BICUBIC)
+        return img
+    except Exception:
+        return None
+
+@functools.lru_cache(maxsize=64)
+def _ctk_image(path, size):
+    """Decode and resize a static asset once per process."""
+    arr = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if arr is not None:
+        h, w = arr.shape[:2]
+        scale = min(size[0] / w, size[1] / h)
+        if scale < 1:
+            arr = cv2.resize(arr, (max(1, int(w * scale)), max(1, int(h * scale))),
+                             interpolation=cv2.INTER_AREA)
+        if arr.ndim == 3 and arr.shape[2] == 4:
+            img = Image.fromarray(cv2.cvtColor(arr, cv2.COLOR_BGRA2RGBA))
+        elif arr.ndim == 3:
+            img = Image.fromarray(cv2.cvtColor(arr, cv2.COLOR_BGR2RGB))
+        else:
+            img = Image.fromarray(arr)
+        return ctk.CTkImage(light_image=img, size=img.size)
+    img = Image.open(path)
+    img.draft("RGB", size)
+    img.thumbnail(size, Image.BICUBIC)
+    return ctk.CTkImage(light_image=img, size=img.size)
 
 # Define script and assets directories
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(SCRIPT_DIR, "assets")
 
+# Risk presentation lookups, shared by the dashboard and history views
+_RISK_COLORS = {"low": ("#2AA876", "LOW RISK"), "moderate": ("#FFC107", "MODERATE RISK"), "high": ("#DC3545", "HIGH RISK")}
+_HISTORY_LEVELS = np.array(["low", "moderate", "high"])
+_HISTORY_COLORS = np.array(["#28A745", "#FFC107", "#DC3545"])
+
+# HSV skin-color bounds, allocated once and frozen
+_LOWER_SKIN = np.array([0, 20, 70], dtype=np.uint8)
+_UPPER_SKIN = np.array([20, 255, 255], dtype=np.uint8)
+_LOWER_SKIN.setflags(write=False)
+_UPPER_SKIN.setflags(write=False)
+
+# Shared thread-safe connection pool; every Database method checks a
+# connection out and returns it when done.
+POOL = psycopg2.pool.ThreadedConnectionPool(1, 8, **DB_CONFIG)
+
+# Hot-path statements are server-side prepared once per pooled
+# connection, skipping parse+plan on every subsequent call. psycopg2
+# does not auto-prepare, so this is the manual mechanism.
+_PREPARED_STATEMENTS = (
+    "PREPARE get_user_by_username (text) AS "
+    "SELECT user_id, username, password_hash, email, appearance_mode FROM users WHERE username = $1",
+    "PREPARE insert_image_stmt (integer, text, text) AS "
+    "INSERT INTO images (user_id, image_path, thumb_path) VALUES ($1, $2, $3) RETURNING image_id",
+    "PREPARE insert_analysis_stmt (integer, float8, float8, varchar, text) AS "
+    "INSERT INTO analyses (image_id, skin_ratio, cancer_probability, cancer_type, advice) "
+    "VALUES ($1, $2, $3, $4, $5) RETURNING analysis_id",
+)
+_PREPARED_CONNS = weakref.WeakSet()
+
+def _prepare(conn):
+    """Prepare the hot-path statements once per pooled connection."""
+    if conn in _PREPARED_CONNS:
+        return
+    with conn.cursor() as cur:
+        for stmt in _PREPARED_STATEMENTS:
+            cur.execute(stmt)
+    conn.commit()
+    _PREPARED_CONNS.add(conn)
+
 # Database Management
 class Database:
-    """Manages database interactions for the app."""
+    """Manages database interactions for the app.
+
+    Connections come from a shared thread-safe pool, so worker threads
+    never serialize on one session and no call pays connection setup.
+    """
     def __init__(self):
-        self.conn = psycopg2.connect(**DB_CONFIG)
-        self.cur = self.conn.cursor()
         self.migrate_schema()
         self.create_tables()
 
     def migrate_schema(self):
         """Update database schema with new columns."""
+        statements = [
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS appearance_mode VARCHAR(10) DEFAULT 'dark'",
+            "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS cancer_probability FLOAT",
+            "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS advice TEXT",
+            "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS cancer_type VARCHAR(50)",
+            "ALTER TABLE images ADD COLUMN IF NOT EXISTS thumb_path TEXT"
+        ]
+        conn = POOL.getconn()
         try:
-            self.cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS appearance_mode VARCHAR(10) DEFAULT 'dark'")
-            self.cur.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS cancer_probability FLOAT")
-            self.cur.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS advice TEXT")
-            self.cur.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS cancer_type VARCHAR(50)")
-            self.conn.commit()
+            # One round-trip and one commit for the whole migration.
+            with conn.cursor() as cur:
+                cur.execute("; ".join(statements))
+            conn.commit()
             logging.info("Schema migration completed.")
         except psycopg2.Error as e:
             logging.error(f"Schema migration failed: {e}")
-            self.conn.rollback()
+            conn.rollback()
+        finally:
+            POOL.putconn(conn)
 
     def create_tables(self):
         """Create necessary tables."""
@@ -65,6 +204,7 @@ class Database:
                 image_id SERIAL PRIMARY KEY,
                 user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
                 image_path TEXT NOT NULL,
+                thumb_path TEXT,
                 upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
             """CREATE TABLE IF NOT EXISTS analyses (
                 analysis_id SERIAL PRIMARY KEY,
@@ -73,170 +213,281 @@ class Database:
                 skin_ratio FLOAT,
                 cancer_probability FLOAT,
                 cancer_type VARCHAR(50),
-                advice TEXT)"""
+                advice TEXT)""",
+            "CREATE INDEX IF NOT EXISTS idx_images_user_id ON images(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_analyses_image_id ON analyses(image_id)",
+            "CREATE INDEX IF NOT EXISTS idx_analyses_image_date ON analyses(image_id, analysis_date DESC)"
         ]
-        for query in table_queries:
-            try:
-                self.cur.execute(query)
-                self.conn.commit()
-            except psycopg2.Error as e:
-                logging.error(f"Failed to create table: {e}")
-                self.conn.rollback()
+        conn = POOL.getconn()
+        try:
+            with conn.cursor() as cur:
+                for query in table_queries:
+                    cur.execute(query)
+            conn.commit()
+        except psycopg2.Error as e:
+            logging.error(f"Failed to create tables: {e}")
+            conn.rollback()
+        finally:
+            POOL.putconn(conn)
 
     def delete_analysis(self, analysis_id):
         """Delete an analysis."""
         query = "DELETE FROM analyses WHERE analysis_id = %s"
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (analysis_id,))
-            self.conn.commit()
+            with conn.cursor() as cur:
+                cur.execute(query, (analysis_id,))
+            conn.commit()
             return True
         except psycopg2.Error as e:
             logging.error(f"Failed to delete analysis: {e}")
-            self.conn.rollback()
+            conn.rollback()
             return False
+        finally:
+            POOL.putconn(conn)
 
     def insert_user(self, username, password_hash, email):
         """Insert a new user."""
         query = """INSERT INTO users (username, password_hash, email, appearance_mode)
                    VALUES (%s, %s, %s, 'dark') RETURNING user_id"""
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (username, password_hash, email))
-            user_id = self.cur.fetchone()[0]
-            self.conn.commit()
+            with conn.cursor() as cur:
+                cur.execute(query, (username, password_hash, email))
+                user_id = cur.fetchone()[0]
+            conn.commit()
             return user_id
         except psycopg2.Error as e:
             logging.error(f"User insertion failed: {e}")
-            self.conn.rollback()
+            conn.rollback()
             return None
+        finally:
+            POOL.putconn(conn)
 
     def get_user_by_username(self, username):
         """Fetch user by username."""
-        query = "SELECT user_id, username, password_hash, email, appearance_mode FROM users WHERE username = %s"
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (username,))
-            return self.cur.fetchone()
+            _prepare(conn)
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE get_user_by_username(%s)", (username,))
+                return cur.fetchone()
         except psycopg2.Error as e:
             logging.error(f"User retrieval failed: {e}")
             return None
+        finally:
+            POOL.putconn(conn)
 
     def get_user_by_email(self, email):
         """Fetch user by email."""
         query = "SELECT user_id FROM users WHERE email = %s"
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (email,))
-            result = self.cur.fetchone()
+            with conn.cursor() as cur:
+                cur.execute(query, (email,))
+                result = cur.fetchone()
             return result[0] if result else None
         except psycopg2.Error as e:
             logging.error(f"Failed to get user by email: {e}")
             return None
+        finally:
+            POOL.putconn(conn)
 
     def update_user(self, user_id, username, email):
         """Update user information."""
         query = "UPDATE users SET username = %s, email = %s WHERE user_id = %s"
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (username, email, user_id))
-            self.conn.commit()
+            with conn.cursor() as cur:
+                cur.execute(query, (username, email, user_id))
+            conn.commit()
             return True
         except psycopg2.Error as e:
             logging.error(f"Failed to update user: {e}")
-            self.conn.rollback()
+            conn.rollback()
             return False
+        finally:
+            POOL.putconn(conn)
 
     def update_appearance_mode(self, user_id, mode):
         """Update user's appearance mode."""
         query = "UPDATE users SET appearance_mode = %s WHERE user_id = %s"
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (mode, user_id))
-            self.conn.commit()
+            with conn.cursor() as cur:
+                cur.execute(query, (mode, user_id))
+            conn.commit()
         except psycopg2.Error as e:
             logging.error(f"Failed to update appearance mode: {e}")
-            self.conn.rollback()
+            conn.rollback()
+        finally:
+            POOL.putconn(conn)
 
-    def insert_image(self, user_id, image_path):
-        """Insert an image with encrypted path."""
-        encrypted_path = CIPHER.encrypt(image_path.encode()).decode()
-        query = "INSERT INTO images (user_id, image_path) VALUES (%s, %s) RETURNING image_id"
+    def insert_image(self, user_id, image_path, thumb_path=None):
+        """Insert an image with encrypted paths."""
+        encrypted_path = _encrypt_path(image_path)
+        encrypted_thumb = _encrypt_path(thumb_path) if thumb_path else None
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (user_id, encrypted_path))
-            image_id = self.cur.fetchone()[0]
-            self.conn.commit()
+            _prepare(conn)
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE insert_image_stmt(%s, %s, %s)", (user_id, encrypted_path, encrypted_thumb))
+                image_id = cur.fetchone()[0]
+            conn.commit()
             return image_id
         except psycopg2.Error as e:
             logging.error(f"Image insertion failed: {e}")
-            self.conn.rollback()
+            conn.rollback()
             return None
+        finally:
+            POOL.putconn(conn)
+
+    def insert_images_bulk(self, user_id, paths):
+        """Insert many images at once, sharing one cipher across the batch
+        and one round-trip per page of rows."""
+        rows = [(user_id, _encrypt_path(p)) for p in paths]
+        query = "INSERT INTO images (user_id, image_path) VALUES (%s, %s)"
+        conn = POOL.getconn()
+        try:
+            with conn.cursor() as cur:
+                execute_batch(cur, query, rows, page_size=500)
+            conn.commit()
+            return True
+        except psycopg2.Error as e:
+            logging.error(f"Bulk image insertion failed: {e}")
+            conn.rollback()
+            return False
+        finally:
+            POOL.putconn(conn)
 
     def insert_analysis(self, image_id, skin_ratio, cancer_probability, cancer_type, advice):
         """Insert analysis results."""
-        query = """INSERT INTO analyses (image_id, skin_ratio, cancer_probability, cancer_type, advice)
-                   VALUES (%s, %s, %s, %s, %s) RETURNING analysis_id"""
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (image_id, float(skin_ratio), float(cancer_probability), cancer_type, advice))
-            analysis_id = self.cur.fetchone()[0]
-            self.conn.commit()
+            _prepare(conn)
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE insert_analysis_stmt(%s, %s, %s, %s, %s)",
+                            (image_id, float(skin_ratio), float(cancer_probability), cancer_type, advice))
+                analysis_id = cur.fetchone()[0]
+            conn.commit()
             return analysis_id
         except psycopg2.Error as e:
             logging.error(f"Analysis insertion failed: {e}")
-            self.conn.rollback()
+            conn.rollback()
             return None
+        finally:
+            POOL.putconn(conn)
 
     def get_user_analyses(self, user_id):
         """Retrieve user's analyses with decrypted paths."""
         query = """SELECT a.analysis_id, a.image_id, a.analysis_date, a.skin_ratio,
-                          a.cancer_probability, a.cancer_type, a.advice, i.image_path
+                          a.cancer_probability, a.cancer_type, a.advice, i.image_path, i.thumb_path
                    FROM analyses a JOIN images i ON a.image_id = i.image_id
                    WHERE i.user_id = %s"""
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (user_id,))
-            analyses = []
-            for analysis in self.cur.fetchall():
-                try:
-                    decrypted_path = CIPHER.decrypt(analysis[7].encode()).decode()
-                except Exception:
-                    decrypted_path = "Decryption error"
-                analyses.append((*analysis[:7], decrypted_path))
-            return analyses
+            with conn.cursor() as cur:
+                # itersize only batches fetches for named cursors, but setting
+                # it keeps this method correct if one is swapped in later.
+                cur.itersize = 2000
+                cur.execute(query, (user_id,))
+                decrypt = _decrypt_path
+                analyses = []
+                append = analyses.append
+                for row in cur:
+                    try:
+                        decrypted_path = decrypt(row[7])
+                    except (InvalidToken, InvalidTag, ValueError):
+                        decrypted_path = "Decryption error"
+                    decrypted_thumb = None
+                    if row[8]:
+                        try:
+                            decrypted_thumb = decrypt(row[8])
+                        except (InvalidToken, InvalidTag, ValueError):
+                            pass
+                    append(row[:7] + (decrypted_path, decrypted_thumb))
+                return analyses
         except psycopg2.Error as e:
             logging.error(f"Failed to retrieve analyses: {e}")
             return []
+        finally:
+            POOL.putconn(conn)
 
     def get_user_registration_date(self, user_id):
         """Get user's registration date."""
         query = "SELECT registration_date FROM users WHERE user_id = %s"
+        conn = POOL.getconn()
         try:
-            self.cur.execute(query, (user_id,))
-            result = self.cur.fetchone()
+            with conn.cursor() as cur:
+                cur.execute(query, (user_id,))
+                result = cur.fetchone()
             return result[0].strftime('%Y-%m-%d') if result else "N/A"
         except psycopg2.Error as e:
             logging.error(f"Failed to get registration date: {e}")
             return "N/A"
+        finally:
+            POOL.putconn(conn)
 
     def close(self):
-        """Close database connection."""
-        self.cur.close()
-        self.conn.close()
+        """Close all pooled connections."""
+        POOL.closeall()
 
 # Skin Detection Logic
 class SkinDetector:
     """Handles skin and cancer detection."""
+    def analyze(self, image_path):
+        """Run both detections from a single decode and shared downscale.
+
+        This path trades bit-exactness for speed: everything is computed
+        on a fixed 256x256 INTER_AREA downsample, and intensity is
+        measured over detected skin pixels rather than the whole frame,
+        so the numbers can differ slightly from the per-method paths
+        while halving disk I/O and decode work.
+        """
+        # Large photos are decoded at reduced scale via libjpeg's IDCT
+        # scaling; the result still exceeds the 256px analysis size.
+        size = os.path.getsize(image_path)
+        if size > 1_000_000:
+            flag = cv2.IMREAD_REDUCED_COLOR_4
+        elif size > 250_000:
+            flag = cv2.IMREAD_REDUCED_COLOR_2
+        else:
+            flag = cv2.IMREAD_COLOR
+        image = cv2.imread(image_path, flag)
+        if image is None:
+            raise ValueError("Couldn’t load image.")
+        small = cv2.resize(image, (256, 256), interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        mask = cv2.inRange(hsv, _LOWER_SKIN, _UPPER_SKIN)
+        skin_pixels = cv2.countNonZero(mask)
+        skin_ratio = skin_pixels / mask.size
+        # Measure intensity over skin pixels only, falling back to the
+        # whole frame when no skin was detected.
+        if skin_pixels:
+            avg_intensity = cv2.mean(gray, mask=mask)[0]
+        else:
+            avg_intensity = cv2.mean(gray)[0]
+        return skin_ratio, self._classify_intensity(avg_intensity)
+
     def detect_skin(self, image_path):
         image = cv2.imread(image_path)
         if image is None:
             raise ValueError("Couldn’t load image.")
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        lower_skin = np.array([0, 20, 70], dtype=np.uint8)
-        upper_skin = np.array([20, 255, 255], dtype=np.uint8)
-        mask = cv2.inRange(hsv, lower_skin, upper_skin)
+        mask = cv2.inRange(hsv, _LOWER_SKIN, _UPPER_SKIN)
         skin_pixels = cv2.countNonZero(mask)
         total_pixels = image.shape[0] * image.shape[1]
-        skin_image = cv2.bitwise_and(image, image, mask=mask)
-        return skin_image, skin_pixels / total_pixels
+        return skin_pixels / total_pixels
 
     def detect_cancer(self, image_path):
         image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
         if image is None:
             raise ValueError("Failed to load image.")
-        avg_intensity = np.mean(image)
+        avg_intensity = cv2.mean(image)[0]
+        return self._classify_intensity(avg_intensity)
+
+    def _classify_intensity(self, avg_intensity):
         probability = min(max((avg_intensity - 100) / 155, 0), 1)
         cancer_detected = probability >= 0.3
         if avg_intensity <= 100:
@@ -362,7 +613,20 @@ class LoginPage(ctk.CTkFrame):
             self.error_label.configure(text="Please fill all fields")
             return
         user = self.parent.db.get_user_by_username(username)
-        if user and bcrypt.verify(password, user[2]):
+        if not user:
+            self.error_label.configure(text="Invalid credentials")
+            return
+        # bcrypt verification costs hundreds of ms by design; run it on a
+        # worker so the mainloop stays responsive.
+        future = _EXECUTOR.submit(bcrypt.verify, password, user[2])
+        future.add_done_callback(lambda f: self.after(0, self._on_verify_done, f, user))
+
+    def _on_verify_done(self, future, user):
+        try:
+            verified = future.result()
+        except Exception:
+            verified = False
+        if verified:
             self.parent.current_user = {"user_id": user[0], "username": user[1], "email": user[3], "appearance_mode": user[4]}
             ctk.set_appearance_mode(user[4])
             self.parent.show_page("DashboardPage")
@@ -402,7 +666,17 @@ class RegistrationPage(ctk.CTkFrame):
         if "@" not in email or "." not in email:
             self.status_label.configure(text="Invalid email format", text_color="red")
             return
-        hashed = bcrypt.hash(password)
+        self.status_label.configure(text="Registering...", text_color="gray")
+        future = _EXECUTOR.submit(bcrypt.using(rounds=BCRYPT_ROUNDS).hash, password)
+        future.add_done_callback(lambda f: self.after(0, self._on_hash_done, f, username, email))
+
+    def _on_hash_done(self, future, username, email):
+        try:
+            hashed = future.result()
+        except Exception as e:
+            logging.error(f"Password hashing failed: {e}")
+            self.status_label.configure(text="Registration failed", text_color="red")
+            return
         user_id = self.parent.db.insert_user(username, hashed, email)
         if user_id:
             self.status_label.configure(text="Registration successful!", text_color="green")
@@ -481,7 +755,10 @@ class DashboardPage(ctk.CTkFrame):
         super().__init__(parent)
         self.parent = parent
         self.image_path = None
+        self.thumb_path = None
         self.analysis_data = None
+        self._analyzing = False
+        self._copy_future = None
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
 
@@ -489,9 +766,7 @@ class DashboardPage(ctk.CTkFrame):
         header = ctk.CTkFrame(self, height=60, corner_radius=0, fg_color="#2B2B2B")
         header.grid(row=0, column=0, sticky="nsew")
         try:
-            icon_img = Image.open(os.path.join(ASSETS_DIR, "icon.png"))
-            icon_img = icon_img.resize((40, 40), Image.LANCZOS)
-            ctk_icon = ctk.CTkImage(light_image=icon_img, size=(40, 40))
+            ctk_icon = _ctk_image(os.path.join(ASSETS_DIR, "icon.png"), (40, 40))
             ctk.CTkLabel(header, image=ctk_icon, text="").pack(side="left", padx=10)
         except Exception as e:
             logging.error(f"Failed to load header icon: {e}")
@@ -519,26 +794,27 @@ class DashboardPage(ctk.CTkFrame):
         control_panel = ctk.CTkFrame(main, corner_radius=15)
         control_panel.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
         try:
-            upload_icon = ctk.CTkImage(light_image=Image.open(os.path.join(ASSETS_DIR, "upload.png")), size=(20, 20))
+            upload_icon = _ctk_image(os.path.join(ASSETS_DIR, "upload.png"), (20, 20))
         except Exception as e:
             logging.error(f"Failed to load upload icon: {e}")
             upload_icon = None
         ctk.CTkButton(control_panel, image=upload_icon, text="Upload Image", height=40, font=("Arial", 14), command=self.upload, compound="left").pack(fill="x", pady=5)
         try:
-            analyze_icon = ctk.CTkImage(light_image=Image.open(os.path.join(ASSETS_DIR, "analyze.png")), size=(20, 20))
+            analyze_icon = _ctk_image(os.path.join(ASSETS_DIR, "analyze.png"), (20, 20))
         except Exception as e:
             logging.error(f"Failed to load analyze icon: {e}")
             analyze_icon = None
-        ctk.CTkButton(control_panel, image=analyze_icon, text="Analyze", height=40, font=("Arial", 14), command=self.analyze, compound="left").pack(fill="x", pady=5)
+        self.analyze_btn = ctk.CTkButton(control_panel, image=analyze_icon, text="Analyze", height=40, font=("Arial", 14), command=self.analyze, compound="left")
+        self.analyze_btn.pack(fill="x", pady=5)
         try:
-            save_icon = ctk.CTkImage(light_image=Image.open(os.path.join(ASSETS_DIR, "save.png")), size=(20, 20))
+            save_icon = _ctk_image(os.path.join(ASSETS_DIR, "save.png"), (20, 20))
         except Exception as e:
             logging.error(f"Failed to load save icon: {e}")
             save_icon = None
         self.save_btn = ctk.CTkButton(control_panel, image=save_icon, text="Save Report", height=40, font=("Arial", 14), state="disabled", command=self.save, compound="left")
         self.save_btn.pack(fill="x", pady=5)
         try:
-            export_icon = ctk.CTkImage(light_image=Image.open(os.path.join(ASSETS_DIR, "export.png")), size=(20, 20))
+            export_icon = _ctk_image(os.path.join(ASSETS_DIR, "export.png"), (20, 20))
         except Exception as e:
             logging.error(f"Failed to load export icon: {e}")
             export_icon = None
@@ -563,8 +839,7 @@ class DashboardPage(ctk.CTkFrame):
         self.parent.current_user["appearance_mode"] = mode
 
     def update_risk_indicator(self, risk_level, cancer_detected):
-        colors = {"low": ("#2AA876", "LOW RISK"), "moderate": ("#FFC107", "MODERATE RISK"), "high": ("#DC3545", "HIGH RISK")}
-        color, text = colors[risk_level]
+        color, text = _RISK_COLORS[risk_level]
         if cancer_detected:
             text += " - DETECTED"
         self.risk_indicator.configure(text=text, fg_color=color)
@@ -577,34 +852,92 @@ class DashboardPage(ctk.CTkFrame):
         if os.path.getsize(path) > MAX_IMAGE_SIZE:
             self.status_bar.configure(text="Image too large (max 10MB)", text_color="red")
             return
+        if imagesize is not None:
+            try:
+                w, h = imagesize.get(path)
+            except Exception:
+                w = h = -1
+            if w > 0 and h > 0 and w * h > MAX_PIXELS:
+                self.status_bar.configure(text="Image resolution too large", text_color="red")
+                return
         try:
             filename = f"{uuid.uuid4().hex}{os.path.splitext(path)[1]}"
             dest = os.path.join(UPLOAD_DIR, filename)
-            shutil.copy(path, dest)
+            # Decode the source once and share the pixels between the
+            # preview and the persisted thumbnail; the byte-for-byte copy
+            # happens in the background.
+            with Image.open(path) as im:
+                im.load()
+            self._copy_future = _EXECUTOR.submit(shutil.copy, path, dest)
             self.image_path = dest
-            self.display_image(dest)
+            self.thumb_path = self._save_thumbnail(im, dest)
+            self.display_image(im)
             self.status_bar.configure(text="Image uploaded", text_color="green")
         except Exception as e:
             self.status_bar.configure(text=f"Upload failed: {str(e)}", text_color="red")
 
-    def display_image(self, path):
+    def _save_thumbnail(self, im, dest):
+        """Persist a small preview next to the upload so history views
+        decode kilobytes instead of the full-size original."""
+        thumb_path = dest + ".thumb.jpg"
         try:
-            img = Image.open(path)
-            img.thumbnail((400, 400))
+            thumb = im.copy()
+            thumb.thumbnail((300, 300), Image.BICUBIC)
+            if thumb.mode != "RGB":
+                thumb = thumb.convert("RGB")
+            thumb.save(thumb_path, "JPEG", quality=85, optimize=True, progressive=True)
+            return thumb_path
+        except Exception as e:
+            logging.error(f"Failed to generate thumbnail: {e}")
+            return None
+
+    def display_image(self, im):
+        try:
+            img = im.copy()
+            img.thumbnail((400, 400), Image.BICUBIC)
             ctk_img = ctk.CTkImage(light_image=img, size=img.size)
+            old = getattr(self.image_label, "image", None)
             self.image_label.configure(image=ctk_img, text="")
             self.image_label.image = ctk_img
+            if old is not None:
+                # Close the previous upload's pixel buffer instead of
+                # waiting for GC, keeping RSS flat across many uploads.
+                try:
+                    old._light_image.close()
+                except Exception:
+                    pass
         except Exception as e:
             self.image_label.configure(text="Failed to display image")
 
     def analyze(self):
+        if self._analyzing:
+            return
         if not self.image_path:
             self.status_bar.configure(text="Upload an image first", text_color="red")
             return
-        detector = SkinDetector()
+        self._analyzing = True
+        self.analyze_btn.configure(state="disabled")
+        self.status_bar.configure(text="Analyzing...", text_color="gray")
+        future = _EXECUTOR.submit(self._run_analysis)
+        future.add_done_callback(lambda f: self.after(0, self._on_analysis_done, f))
+
+    def _wait_for_copy(self):
+        """Block until the background copy of the upload has landed, so
+        readers of image_path never see a partially written file."""
+        future = self._copy_future
+        if future is not None:
+            future.result()
+
+    def _run_analysis(self):
+        """Run the detectors off the GUI thread and return their results."""
+        self._wait_for_copy()
+        return self.parent.detector().analyze(self.image_path)
+
+    def _on_analysis_done(self, future):
+        self._analyzing = False
+        self.analyze_btn.configure(state="normal")
         try:
-            _, skin_ratio = detector.detect_skin(self.image_path)
-            cancer_prob, cancer_type, advice, risk_level, cancer_detected = detector.detect_cancer(self.image_path)
+            skin_ratio, (cancer_prob, cancer_type, advice, risk_level, cancer_detected) = future.result()
             self.analysis_data = {
                 "skin_ratio": skin_ratio, "cancer_prob": cancer_prob, "cancer_type": cancer_type,
                 "advice": advice, "risk_level": risk_level, "cancer_detected": cancer_detected,
@@ -628,7 +961,7 @@ Risk Level: {risk_level.title()}
     def save(self):
         if self.image_path and self.analysis_data:
             try:
-                image_id = self.parent.db.insert_image(self.parent.current_user["user_id"], self.image_path)
+                image_id = self.parent.db.insert_image(self.parent.current_user["user_id"], self.image_path, self.thumb_path)
                 if image_id:
                     analysis_id = self.parent.db.insert_analysis(
                         image_id, self.analysis_data["skin_ratio"], self.analysis_data["cancer_prob"],
@@ -659,14 +992,43 @@ Risk Level: {risk_level.title()}
                 **self.analysis_data,
                 "disclaimer": "This is an automated analysis. Consult a medical professional."
             }
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                temp_img_path = os.path.join(tmp_dir, "analysis_image.jpg")
-                img = Image.open(self.image_path)
-                img.save(temp_img_path, quality=95)
-                pdf = MedicalReport(icon_path=os.path.join(ASSETS_DIR, "icon.png"))
-                pdf.add_page()
-                pdf.add_report_content(user_data, analysis_data, temp_img_path)
-                pdf.output(file_path)
+            # Re-encode the image in a worker while the report skeleton
+            # is built, overlapping the two independent steps.
+            img_future = _EXECUTOR.submit(self._encode_report_image)
+            pdf = MedicalReport(icon_path=os.path.join(ASSETS_DIR, "icon.png"))
+            pdf.add_page()
+            pdf.add_report_content(user_data, analysis_data, img_future.result())
+            out_future = _EXECUTOR.submit(pdf.output, file_path)
+            out_future.add_done_callback(lambda f: self.after(0, self._on_export_done, f, file_path))
+        except Exception as e:
+            self.status_bar.configure(text=f"Export failed: {str(e)}", text_color="red")
+
+    def _encode_report_image(self):
+        """Encode the report image into an in-memory JPEG buffer."""
+        self._wait_for_copy()
+        buf = io.BytesIO()
+        img = Image.open(self.image_path)
+        img.draft("RGB", (1600, 1600))
+        img.thumbnail((1200, 1200), Image.BICUBIC)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(buf, "JPEG", quality=85, optimize=True, progressive=True)
+        # Recompress with jpegoptim when available; typically a further
+        # size reduction at no visual cost.
+        if shutil.which("jpegoptim"):
+            try:
+                proc = subprocess.run(["jpegoptim", "--strip-all", "-m85", "--stdin", "--stdout"],
+                                      input=buf.getvalue(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                if proc.returncode == 0 and proc.stdout:
+                    buf = io.BytesIO(proc.stdout)
+            except Exception as e:
+                logging.error(f"jpegoptim pass failed: {e}")
+        buf.seek(0)
+        return buf
+
+    def _on_export_done(self, future, file_path):
+        try:
+            future.result()
             self.status_bar.configure(text=f"Exported to: {file_path}", text_color="green")
             webbrowser.open(file_path)
         except Exception as e:
@@ -674,6 +1036,7 @@ Risk Level: {risk_level.title()}
 
     def logout(self):
         self.parent.current_user = None
+        self.parent.reset_pages()
         self.parent.show_page("LoginPage")
 
 # History Page
@@ -683,14 +1046,13 @@ class HistoryPage(ctk.CTkFrame):
         self.parent = parent
         self.selected_analyses = set()
         self.analysis_vars = {}
+        self._thumb_cache = {}
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
         header = ctk.CTkFrame(self, height=60, corner_radius=0, fg_color="#2B2B2B")
         header.grid(row=0, column=0, sticky="nsew")
         try:
-            icon_img = Image.open(os.path.join(ASSETS_DIR, "icon.png"))
-            icon_img = icon_img.resize((40, 40), Image.LANCZOS)
-            ctk_icon = ctk.CTkImage(light_image=icon_img, size=(40, 40))
+            ctk_icon = _ctk_image(os.path.join(ASSETS_DIR, "icon.png"), (40, 40))
             ctk.CTkLabel(header, image=ctk_icon, text="").pack(side="left", padx=10)
         except Exception as e:
             logging.error(f"Failed to load history icon: {e}")
@@ -731,27 +1093,46 @@ class HistoryPage(ctk.CTkFrame):
         self.back_button.pack_forget()
         self.status_bar = ctk.CTkLabel(self, text="", anchor="w", font=("Arial", 12), text_color="gray")
         self.status_bar.grid(row=3, column=0, sticky="ew", padx=20, pady=5)
+
+    def on_show(self):
         self.load_history()
 
     def load_history(self):
         for widget in self.history_frame.winfo_children():
             widget.destroy()
         analyses = self.parent.db.get_user_analyses(self.parent.current_user["user_id"])
-        for analysis in analyses:
-            entry = ctk.CTkFrame(self.history_frame, corner_radius=8)
+        # Decode all row thumbnails concurrently so clicking a row never
+        # stalls the GUI thread on a JPEG decode.
+        self._thumb_cache = dict(zip(
+            (a[0] for a in analyses),
+            _EXECUTOR.map(_decode_thumb, [a[8] or a[7] for a in analyses], chunksize=4)))
+        # Precompute all row data before touching widgets, then build the
+        # rows in a tight loop with local aliases for the widget classes.
+        # The risk thresholds are classified for all rows in one vectorized
+        # pass instead of a chained comparison per row.
+        probs = np.fromiter((a[4] for a in analyses), dtype=np.float32, count=len(analyses))
+        idx = np.digitize(probs, (0.2, 0.5))
+        level_names = _HISTORY_LEVELS[idx]
+        level_colors = _HISTORY_COLORS[idx]
+        rows = []
+        for analysis, risk_level, color in zip(analyses, level_names, level_colors):
+            cancer_type = analysis[5] if analysis[5] else "Unknown"
+            rows.append((analysis,
+                         analysis[2].strftime("%d %b %Y"),
+                         color,
+                         f"{cancer_type} - Risk: {risk_level.title()} ({analysis[4]:.1%})"))
+        frame_cls, label_cls, button_cls, checkbox_cls, intvar_cls = \
+            ctk.CTkFrame, ctk.CTkLabel, ctk.CTkButton, ctk.CTkCheckBox, ctk.IntVar
+        for analysis, date_str, color, text in rows:
+            entry = frame_cls(self.history_frame, corner_radius=8)
             entry.pack(fill="x", pady=5)
-            var = ctk.IntVar(value=0)
+            var = intvar_cls(value=0)
             self.analysis_vars[analysis[0]] = var
-            cb = ctk.CTkCheckBox(entry, text="", variable=var, command=lambda aid=analysis[0]: self.update_selection(aid))
+            cb = checkbox_cls(entry, text="", variable=var, command=lambda aid=analysis[0]: self.update_selection(aid))
             cb.pack(side="left", padx=5)
-            date_str = analysis[2].strftime("%d %b %Y")
-            cancer_type = analysis[5] if analysis[5] else "Unknown"
-            risk_level = "high" if analysis[4] >= 0.5 else "moderate" if analysis[4] >= 0.2 else "low"
-            colors = {"high": "#DC3545", "moderate": "#FFC107", "low": "#28A745"}
-            ctk.CTkLabel(entry, text=date_str, width=100, font=("Arial", 12), fg_color=colors[risk_level], corner_radius=6).pack(side="left", padx=5)
-            text = f"{cancer_type} - Risk: {risk_level.title()} ({analysis[4]:.1%})"
-            ctk.CTkButton(entry, text=text, width=200, anchor="w", command=lambda a=analysis: self.show_analysis(a)).pack(side="left", padx=5)
-            ctk.CTkButton(entry, text="✖", width=30, fg_color="transparent", hover_color="#DC3545", command=lambda aid=analysis[0]: self.delete_analysis(aid)).pack(side="right", padx=5)
+            label_cls(entry, text=date_str, width=100, font=("Arial", 12), fg_color=color, corner_radius=6).pack(side="left", padx=5)
+            button_cls(entry, text=text, width=200, anchor="w", command=lambda a=analysis: self.show_analysis(a)).pack(side="left", padx=5)
+            button_cls(entry, text="✖", width=30, fg_color="transparent", hover_color="#DC3545", command=lambda aid=analysis[0]: self.delete_analysis(aid)).pack(side="right", padx=5)
 
     def update_selection(self, aid):
         if self.analysis_vars[aid].get() == 1:
@@ -772,7 +1153,8 @@ class HistoryPage(ctk.CTkFrame):
         for i, analysis in enumerate(analyses):
             try:
                 img = Image.open(analysis[7])
-                img.thumbnail((200, 200))
+                img.draft("RGB", (200, 200))
+                img.thumbnail((200, 200), Image.BICUBIC)
                 ctk_img = ctk.CTkImage(light_image=img, size=img.size)
                 if i == 0:
                     self.analysis_image1.configure(image=ctk_img, text="")
@@ -813,13 +1195,15 @@ class HistoryPage(ctk.CTkFrame):
         self.back_button.pack_forget()
 
     def show_analysis(self, analysis):
-        try:
-            img = Image.open(analysis[7])
-            img.thumbnail((300, 300))
+        img = self._thumb_cache.get(analysis[0])
+        if img is None:
+            img = _decode_thumb(analysis[8] or analysis[7])
+            self._thumb_cache[analysis[0]] = img
+        if img is not None:
             ctk_img = ctk.CTkImage(light_image=img, size=img.size)
             self.preview_image.configure(image=ctk_img, text="")
             self.preview_image.image = ctk_img
-        except Exception:
+        else:
             self.preview_image.configure(image=None, text="Image unavailable")
         text = f"Date: {analysis[2].strftime('%Y-%m-%d %H:%M')}\n"
         text += f"Skin Coverage: {analysis[3]:.1%}\n"
@@ -876,13 +1260,22 @@ class AboutPage(ctk.CTkFrame):
         frame.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
         ctk.CTkLabel(frame, text="Skin Cancer Detection Pro", font=("Arial", 24, "bold")).pack(pady=20)
         ctk.CTkLabel(frame, text="Version: 1.0.0", font=("Arial", 16)).pack(pady=5)
+        # Kick off all portrait decodes in parallel before any widget
+        # consumes them; the lru_cache makes later visits instant.
+        dev_path = os.path.join(ASSETS_DIR, "developer.png")
+        members = [
+            ("Team Member 1", os.path.join(ASSETS_DIR, "member1.png")),
+            ("Team Member 2", os.path.join(ASSETS_DIR, "member2.png")),
+            ("Team Member 3", os.path.join(ASSETS_DIR, "member3.png"))
+        ]
+        futures = {dev_path: _ASSET_POOL.submit(_ctk_image, dev_path, (100, 100))}
+        for _, img_path in members:
+            futures[img_path] = _ASSET_POOL.submit(_ctk_image, img_path, (50, 50))
         dev_frame = ctk.CTkFrame(frame, fg_color="transparent")
         dev_frame.pack(pady=20)
         ctk.CTkLabel(dev_frame, text="Developed by: Your Name", font=("Arial", 16, "bold")).pack(anchor="w")
         try:
-            dev_img = Image.open(os.path.join(ASSETS_DIR, "developer.png"))
-            dev_img = dev_img.resize((100, 100), Image.LANCZOS)
-            ctk_dev_img = ctk.CTkImage(light_image=dev_img, size=(100, 100))
+            ctk_dev_img = futures[dev_path].result()
             ctk.CTkLabel(dev_frame, image=ctk_dev_img, text="").pack(pady=10)
         except Exception as e:
             logging.error(f"Failed to load developer image: {e}")
@@ -890,18 +1283,11 @@ class AboutPage(ctk.CTkFrame):
         team_frame = ctk.CTkFrame(frame, fg_color="transparent")
         team_frame.pack(pady=20)
         ctk.CTkLabel(team_frame, text="Team Members:", font=("Arial", 18, "bold")).pack(anchor="w")
-        members = [
-            ("Team Member 1", os.path.join(ASSETS_DIR, "member1.png")),
-            ("Team Member 2", os.path.join(ASSETS_DIR, "member2.png")),
-            ("Team Member 3", os.path.join(ASSETS_DIR, "member3.png"))
-        ]
         for name, img_path in members:
             member_frame = ctk.CTkFrame(team_frame, fg_color="transparent")
             member_frame.pack(fill="x", pady=5)
             try:
-                img = Image.open(img_path)
-                img = img.resize((50, 50), Image.LANCZOS)
-                ctk_img = ctk.CTkImage(light_image=img, size=(50, 50))
+                ctk_img = futures[img_path].result()
                 ctk.CTkLabel(member_frame, image=ctk_img, text="").pack(side="left", padx=10)
             except Exception as e:
                 logging.error(f"Failed to load team member image {img_path}: {e}")
@@ -925,6 +1311,8 @@ class MedicalApp(ctk.CTk):
         ctk.set_window_scaling(1.1)
         self.db = Database()
         self.current_user = None
+        self._detector = None
+        self._page_instances = {}
         self.pages = {
             "LoginPage": LoginPage,
             "RegistrationPage": RegistrationPage,
@@ -936,11 +1324,32 @@ class MedicalApp(ctk.CTk):
         }
         self.show_page("LoginPage")
 
+    def detector(self):
+        """Return the shared SkinDetector, creating it on first use."""
+        if self._detector is None:
+            self._detector = SkinDetector()
+        return self._detector
+
     def show_page(self, page_name):
-        if hasattr(self, "current_page"):
-            self.current_page.destroy()
-        self.current_page = self.pages[page_name](self)
-        self.current_page.pack(expand=True, fill="both")
+        page = self._page_instances.get(page_name)
+        if page is None:
+            page = self.pages[page_name](self)
+            self._page_instances[page_name] = page
+        current = getattr(self, "current_page", None)
+        if current is not None and current is not page:
+            current.pack_forget()
+        page.pack(expand=True, fill="both")
+        self.current_page = page
+        on_show = getattr(page, "on_show", None)
+        if on_show is not None:
+            on_show()
+
+    def reset_pages(self):
+        """Drop cached pages so the next login rebuilds user-specific widgets."""
+        for page in self._page_instances.values():
+            page.destroy()
+        self._page_instances.clear()
+        self.current_page = None
 
     def on_closing(self):
         self.db.close()